@@ -1,4 +1,44 @@
+import warnings
+
 import setuptools
+from setuptools.command.build_ext import build_ext
+from setuptools.errors import BaseError, CCompilerError
+
+
+class OptionalBuildExt(build_ext):
+    """
+    Builds the C extensions, but falls back to the pure python modules if they can't be compiled.
+    """
+
+    def run(self):
+        try:
+            super().run()
+        except (BaseError, CCompilerError) as e:
+            warnings.warn(f'Could not build the C extensions, using the pure python modules: {e}')
+
+    def build_extension(self, ext):
+        try:
+            super().build_extension(ext)
+        except (BaseError, CCompilerError) as e:
+            warnings.warn(f'Could not build {ext.name}, using the pure python module: {e}')
+
+
+# compile the converter with Cython, if it is available, the pure python module is the fallback
+try:
+    from Cython.Build import cythonize
+    from Cython.Compiler.Errors import CompileError
+except ImportError:
+    ext_modules = []
+else:
+    try:
+        ext_modules = cythonize(['yaml2sbml/yaml2sbml.py'],
+                                language_level=3,
+                                compiler_directives={'boundscheck': False,
+                                                     'wraparound': False,
+                                                     'annotation_typing': False})
+    except CompileError as e:
+        warnings.warn(f'Could not cythonize yaml2sbml, using the pure python module: {e}')
+        ext_modules = []
 
 setuptools.setup(
     name="yaml2sbml",
@@ -8,8 +48,12 @@ setuptools.setup(
     description="A small package to convert ODEs specified in a yaml file to SBML.",
     url="https://github.com/martamatos/yaml2sbml",
     packages=setuptools.find_packages(),
+    ext_modules=ext_modules,
+    cmdclass={'build_ext': OptionalBuildExt},
     install_requires=["python-libsbml>=5.18.0",
                       "PyYAML>=5.3"],
+    extras_require={"ryml": ["rapidyaml"],
+                    "pyfastyaml": ["pyfastyaml"]},
     python_requires='>=3.6',
     classifiers=[
         "Programming Language :: Python :: 3.6+",
@@ -1,7 +1,16 @@
+import importlib
 import os
+import pathlib
+import sys
+import tempfile
+import types
 import unittest
+from unittest import mock
 
-from yaml2sbml.yaml2sbml import parse_yaml
+import yaml
+
+from yaml2sbml import yaml2sbml
+from yaml2sbml.yaml2sbml import YamlToSbmlConverter, parse_yaml, yaml2sbml as convert_yaml
 
 
 class TestYamlImport(unittest.TestCase):
@@ -45,6 +54,135 @@ class TestYamlImport(unittest.TestCase):
 
         os.remove(os.path.join(self.test_folder, 'sbml_test.xml'))
 
+    def test_yaml_to_sbml_file(self):
+        ode_file = os.path.join(self.test_folder, 'ode_input2.yaml')
+        expected_result_file = os.path.join(self.test_folder, 'true_sbml_output2.xml')
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            sbml_file = pathlib.Path(tmp_dir) / 'sbml_test.xml'
+            convert_yaml(pathlib.Path(ode_file), sbml_file)
+
+            with open(sbml_file, 'r') as f_in:
+                sbml_contents = f_in.read()
+
+        with open(expected_result_file, 'r') as f_in:
+            expected_sbml_contents = f_in.read()
+
+        self.assertEqual(expected_sbml_contents, sbml_contents)
+
+    def test_yaml_to_sbml_file_bad_path(self):
+        ode_file = os.path.join(self.test_folder, 'ode_input2.yaml')
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            sbml_file = os.path.join(tmp_dir, 'missing_dir', 'sbml_test.xml')
+
+            with self.assertRaisesRegex(OSError, 'sbml_test.xml'):
+                convert_yaml(ode_file, sbml_file)
+
+    def test_converter_reuse(self):
+        converter = YamlToSbmlConverter()
+
+        for i in [1, 2, 1]:
+            ode_file = os.path.join(self.test_folder, f'ode_input{i}.yaml')
+            expected_result_file = os.path.join(self.test_folder, f'true_sbml_output{i}.xml')
+
+            sbml_contents = converter.convert_to_string(ode_file)
+
+            with open(expected_result_file, 'r') as f_in:
+                expected_sbml_contents = f_in.read()
+
+            self.assertEqual(expected_sbml_contents, sbml_contents)
+
+    def test_yaml_import_without_validation(self):
+        for i in [1, 2]:
+            ode_file = os.path.join(self.test_folder, f'ode_input{i}.yaml')
+            expected_result_file = os.path.join(self.test_folder, f'true_sbml_output{i}.xml')
+
+            sbml_contents = parse_yaml(ode_file, validate=False)
+
+            with open(expected_result_file, 'r') as f_in:
+                expected_sbml_contents = f_in.read()
+
+            self.assertEqual(expected_sbml_contents, sbml_contents)
+
+    @unittest.skipIf(yaml2sbml.ryml is None, 'rapidyaml is not installed')
+    def test_yaml_import_ryml(self):
+        ode_file = os.path.join(self.test_folder, 'ode_input2.yaml')
+        expected_result_file = os.path.join(self.test_folder, 'true_sbml_output2.xml')
+
+        with mock.patch.object(yaml2sbml, '_USE_RYML', True):
+            sbml_contents = parse_yaml(ode_file)
+
+        with open(expected_result_file, 'r') as f_in:
+            expected_sbml_contents = f_in.read()
+
+        self.assertEqual(expected_sbml_contents, sbml_contents)
+
+        # aliases and plain scalars have to be resolved like PyYAML does
+        ode_file = os.path.join(self.test_folder, 'ode_input3.yaml')
+
+        with mock.patch.object(yaml2sbml, '_USE_RYML', True):
+            yaml_dic = yaml2sbml._load_yaml_file(ode_file)
+
+        expected_yaml_dic = yaml2sbml._load_yaml_file(ode_file)
+
+        self.assertEqual(expected_yaml_dic, yaml_dic)
+        self.assertEqual('k1', yaml_dic['observables'][0]['formula'])
+        self.assertEqual(float('inf'), yaml_dic['parameters'][0]['value'])
+        self.assertEqual(16, yaml_dic['parameters'][1]['value'])
+        self.assertEqual('2', yaml_dic['parameters'][3]['value'])
+        self.assertEqual(0, yaml_dic['odes'][0]['right_hand_side'])
+
+        # files with an explicit document start and tagged keys
+        with open(os.path.join(self.test_folder, 'ode_input2.yaml'), 'r') as f_in:
+            ode_contents = f_in.read()
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            ode_file = os.path.join(tmp_dir, 'ode_input.yaml')
+            with open(ode_file, 'w') as f_out:
+                f_out.write('---\n' + ode_contents)
+
+            with mock.patch.object(yaml2sbml, '_USE_RYML', True):
+                sbml_contents = parse_yaml(ode_file)
+
+            tagged_key_file = os.path.join(tmp_dir, 'tagged_key.yaml')
+            with open(tagged_key_file, 'w') as f_out:
+                f_out.write('? !!str 1\n: x\n2: y\n')
+
+            with mock.patch.object(yaml2sbml, '_USE_RYML', True):
+                yaml_dic = yaml2sbml._load_yaml_file(tagged_key_file)
+
+        self.assertEqual(expected_sbml_contents, sbml_contents)
+        self.assertEqual({'1': 'x', 2: 'y'}, yaml_dic)
+
+    @unittest.skipUnless(yaml2sbml.__file__.endswith('.py'), 'compiled modules can not be reloaded')
+    def test_yaml_import_pyfastyaml(self):
+        ode_file = os.path.join(self.test_folder, 'ode_input2.yaml')
+        expected_result_file = os.path.join(self.test_folder, 'true_sbml_output2.xml')
+
+        fake_pyfastyaml = types.ModuleType('pyfastyaml')
+        fake_pyfastyaml.loads = mock.Mock(side_effect=yaml.safe_load)
+
+        try:
+            with mock.patch.dict(sys.modules, {'pyfastyaml': fake_pyfastyaml}), \
+                    mock.patch.dict(os.environ, {'YAML2SBML_YAML_BACKEND': 'pyfastyaml'}):
+                importlib.reload(yaml2sbml)
+                self.assertIs(fake_pyfastyaml, yaml2sbml._yaml_backend)
+
+                sbml_contents = yaml2sbml.parse_yaml(ode_file)
+        finally:
+            importlib.reload(yaml2sbml)
+
+        self.assertIsNone(yaml2sbml._yaml_backend)
+
+        with open(ode_file, 'r', encoding='utf-8') as f_in:
+            fake_pyfastyaml.loads.assert_called_once_with(f_in.read())
+
+        with open(expected_result_file, 'r') as f_in:
+            expected_sbml_contents = f_in.read()
+
+        self.assertEqual(expected_sbml_contents, sbml_contents)
+
 
 if __name__ == '__main__':
     suite = unittest.TestSuite()
@@ -1,11 +1,73 @@
 import argparse
+import functools
+import math
+import mmap
+import os
 import warnings
+import xml.sax.saxutils
+from typing import Union
 
 import libsbml as sbml
 import yaml
 
-
-def yaml2sbml(yaml_file: str, sbml_file: str):
+try:
+    import cython
+except ImportError:
+    # pure python fallback for the decorators used when the module is compiled with Cython
+    class cython:
+        @staticmethod
+        def ccall(func):
+            return func
+
+try:
+    from yaml import CSafeLoader as _Loader
+except ImportError:
+    from yaml import SafeLoader as _Loader
+
+try:
+    import ryml
+except ImportError:
+    ryml = None
+
+# used to give the scalars parsed by rapidyaml the same types as PyYAML does
+_SCALAR_RESOLVER = yaml.resolver.Resolver()
+_SCALAR_CONSTRUCTOR = yaml.constructor.SafeConstructor()
+# plain scalars starting with any other character always resolve to str
+_SCALAR_RESOLVER_FIRST_CHARS = frozenset(_SCALAR_RESOLVER.yaml_implicit_resolvers)
+
+# settings shared by all formula parser calls; units are not supported, so they are not parsed
+_L3_SETTINGS = sbml.L3ParserSettings()
+_L3_SETTINGS.setParseUnits(False)
+
+# all species share these attributes, they are copied from here instead of being set one by one
+_SPECIES_TEMPLATE = sbml.Species(3, 1)
+_SPECIES_TEMPLATE.setConstant(False)
+_SPECIES_TEMPLATE.setBoundaryCondition(False)
+_SPECIES_TEMPLATE.setHasOnlySubstanceUnits(False)
+_SPECIES_TEMPLATE.setCompartment('Compartment')
+_SPECIES_TEMPLATE.setSubstanceUnits('dimensionless')
+
+# skeleton model with the default compartment, copied into each new model
+_TEMPLATE_DOC = sbml.SBMLDocument(3, 1)
+_TEMPLATE_COMPARTMENT = _TEMPLATE_DOC.createModel().createCompartment()
+_TEMPLATE_COMPARTMENT.setId('Compartment')
+_TEMPLATE_COMPARTMENT.setConstant(True)
+_TEMPLATE_COMPARTMENT.setSize(1)
+
+# an alternative yaml parser can be selected via the environment
+if os.environ.get('YAML2SBML_YAML_BACKEND') == 'pyfastyaml':
+    import pyfastyaml as _yaml_backend
+else:
+    _yaml_backend = None
+
+# rapidyaml parses faster, but building the python objects from its tree is not reliably faster than
+# CSafeLoader, so it is only used when selected
+_USE_RYML = os.environ.get('YAML2SBML_YAML_BACKEND') == 'ryml'
+if _USE_RYML and ryml is None:
+    raise ImportError('YAML2SBML_YAML_BACKEND=ryml requires rapidyaml to be installed')
+
+
+def yaml2sbml(yaml_file: Union[str, os.PathLike], sbml_file: Union[str, os.PathLike]):
     """
     Takes in a yaml file with the ODE specification, parses it, converts it into SBML format, and writes the SBML file.
 
@@ -16,21 +78,20 @@ def yaml2sbml(yaml_file: str, sbml_file: str):
     Returns:
 
     Raises:
+        OSError
 
     """
-    sbml_as_string = parse_yaml(yaml_file)
-
-    # write sbml file
-    with open(sbml_file, 'w') as f_out:
-        f_out.write(sbml_as_string)
+    YamlToSbmlConverter().convert(yaml_file, sbml_file)
 
 
-def parse_yaml(yaml_file: str) -> str:
+def parse_yaml(yaml_file: str, validate: bool = True) -> str:
     """
     Takes in a yaml file with the specification of ODEs, parses it, and returns the corresponding SBML string.
 
     Arguments:
         yaml_file: path to the yaml file with the ODEs specification
+        validate: if True, the model is built from libsbml objects, which check the given ids and values.
+                  Otherwise the SBML string is assembled directly, which is considerably faster for large models.
 
     Returns:
         sbml_string: a string containing the ODEs in SBML format
@@ -38,29 +99,99 @@ def parse_yaml(yaml_file: str) -> str:
     Raises:
         SystemExit
     """
-    try:
-        document = sbml.SBMLDocument(3, 1)
-    except ValueError:
-        raise SystemExit('Could not create SBMLDocument object')
-
-    model = document.createModel()
-    model = _create_compartment(model)
+    if not validate:
+        builder = SbmlStringBuilder()
+        _create_compartment(builder)
+        _convert_yaml_blocks_to_sbml(builder, _load_yaml_file(yaml_file))
 
-    yaml_dic = _load_yaml_file(yaml_file)
-    model = _convert_yaml_blocks_to_sbml(model, yaml_dic)
+        return builder.to_string()
 
-    sbml_string = sbml.writeSBMLToString(document)
+    sbml_string = YamlToSbmlConverter().convert_to_string(yaml_file)
 
     return sbml_string
 
 
+class YamlToSbmlConverter:
+    """
+    Converts yaml files with ODE specifications to SBML.
+    A single SBMLDocument is reused for all conversions, which saves setting up a new document for
+    every file when many models are converted in one process.
+    """
+
+    def __init__(self):
+        """
+        Raises:
+            SystemExit
+        """
+        try:
+            self._document = sbml.SBMLDocument(3, 1)
+        except ValueError:
+            raise SystemExit('Could not create SBMLDocument object')
+
+    def convert(self, yaml_file: Union[str, os.PathLike], sbml_file: Union[str, os.PathLike]):
+        """
+        Converts a yaml file with the ODE specification and writes the SBML file.
+
+        Arguments:
+            yaml_file: path to the yaml file with the ODEs specification
+            sbml_file: path to the SBML file to be written out
+
+        Returns:
+
+        Raises:
+            OSError
+
+        """
+        # write sbml file directly from libsbml, which only accepts str paths and returns 0 on failure
+        sbml_file = os.fspath(sbml_file)
+        if not sbml.writeSBMLToFile(self._build_document(yaml_file), sbml_file):
+            raise OSError(f'Could not write SBML file {sbml_file}')
+
+    def convert_to_string(self, yaml_file: str) -> str:
+        """
+        Converts a yaml file with the ODE specification and returns the SBML string.
+
+        Arguments:
+            yaml_file: path to the yaml file with the ODEs specification
+
+        Returns:
+            sbml_string: a string containing the ODEs in SBML format
+
+        Raises:
+
+        """
+        return sbml.writeSBMLToString(self._build_document(yaml_file))
+
+    def _build_document(self, yaml_file: str) -> sbml.SBMLDocument:
+        """
+        Replaces the model of the document by the one specified in the yaml file.
+
+        Arguments:
+            yaml_file: path to the yaml file with the ODEs specification
+
+        Returns:
+            document: the SBML document containing the ODEs
+
+        Raises:
+
+        """
+        # createModel replaces the model of the previous conversion
+        model = self._document.createModel()
+        _create_compartment(model)
+
+        yaml_dic = _load_yaml_file(yaml_file)
+        _convert_yaml_blocks_to_sbml(model, yaml_dic)
+
+        return self._document
+
+
 def _create_compartment(model):
     """
-    Creates a default compartment for the model.
+    Creates a default compartment for the model, copied from the template model.
     We don't support multiple compartments at the moment.
 
     Arguments:
-        model: SBML model
+        model: SBML model or SbmlStringBuilder
 
     Returns:
         model: SBML model with added compartment
@@ -68,10 +199,10 @@ def _create_compartment(model):
     Raises:
 
     """
-    c = model.createCompartment()
-    c.setId('Compartment')
-    c.setConstant(True)
-    c.setSize(1)
+    if isinstance(model, SbmlStringBuilder):
+        model.append_default_compartment()
+    else:
+        model.appendFrom(_TEMPLATE_DOC.getModel())
 
     return model
 
@@ -79,6 +210,8 @@ def _create_compartment(model):
 def _load_yaml_file(yaml_file: str) -> dict:
     """
     Loads yaml file and returns the resulting dictionary.
+    Setting the environment variable YAML2SBML_YAML_BACKEND=pyfastyaml or YAML2SBML_YAML_BACKEND=ryml
+    parses all files with pyfastyaml or rapidyaml instead of PyYAML.
 
     Arguments:
         yaml_file: SBML model
@@ -89,19 +222,153 @@ def _load_yaml_file(yaml_file: str) -> dict:
     Raises:
 
     """
-    with open(yaml_file, 'r') as f_in:
-        yaml_contents = f_in.read()
-        yaml_dic = yaml.full_load(yaml_contents)
+    if _yaml_backend is not None:
+        with open(yaml_file, 'r', encoding='utf-8') as f_in:
+            return _yaml_backend.loads(f_in.read())
+
+    # empty files can't be memory-mapped, they are left to PyYAML
+    if _USE_RYML and os.path.getsize(yaml_file) > 0:
+        return _load_yaml_file_ryml(yaml_file)
+
+    # the parser reads the mapped file in bytes chunks via .read(size) and decodes them itself,
+    # so the file is never decoded into a python str
+    with open(yaml_file, 'rb') as f_in:
+        # empty files can't be memory-mapped
+        if os.fstat(f_in.fileno()).st_size == 0:
+            return yaml.load(f_in, Loader=_Loader)
+
+        with mmap.mmap(f_in.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            yaml_dic = yaml.load(buf, Loader=_Loader)
 
     return yaml_dic
 
 
+def _load_yaml_file_ryml(yaml_file: str) -> dict:
+    """
+    Loads yaml file with rapidyaml and returns the resulting dictionary.
+    Aliases and scalars are resolved the same way as by PyYAML's safe loader.
+
+    Arguments:
+        yaml_file: path to the yaml file
+
+    Returns:
+        yaml_dic: dictionary with parsed yaml file contents
+
+    Raises:
+
+    """
+    with open(yaml_file, 'rb') as f_in:
+        with mmap.mmap(f_in.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            tree = ryml.parse_in_arena(buf)
+
+    # replace aliases by copies of the anchored nodes
+    tree.resolve()
+
+    root = tree.root_id()
+    # files starting with an explicit '---' are parsed as a stream of documents
+    if tree.is_stream(root):
+        if tree.num_children(root) == 0:
+            return None
+        if tree.num_children(root) > 1:
+            raise yaml.composer.ComposerError('expected a single document in the stream', None,
+                                              'but found another document', None)
+        root = tree.first_child(root)
+
+    return _ryml_node_to_python(tree, root)
+
+
+def _ryml_node_to_python(tree, node: int):
+    """
+    Recursively converts a node of a rapidyaml tree into dicts, lists and scalars.
+
+    Arguments:
+        tree: rapidyaml tree
+        node: id of the node to convert
+
+    Returns:
+        the node contents as a dict, list, scalar or None
+
+    Raises:
+
+    """
+    if tree.is_map(node):
+        yaml_dic = {}
+        child = tree.first_child(node)
+        while child != ryml.NONE:
+            yaml_dic[_ryml_key_to_python(tree, child)] = _ryml_node_to_python(tree, child)
+            child = tree.next_sibling(child)
+        return yaml_dic
+    if tree.is_seq(node):
+        yaml_list = []
+        child = tree.first_child(node)
+        while child != ryml.NONE:
+            yaml_list.append(_ryml_node_to_python(tree, child))
+            child = tree.next_sibling(child)
+        return yaml_list
+
+    tag = bytes(tree.val_tag(node)).decode() if tree.has_val_tag(node) else None
+
+    return _ryml_scalar_to_python(tree.val(node), tree.is_val_plain(node), tag)
+
+
+def _ryml_key_to_python(tree, node: int):
+    """
+    Converts the key of a node of a rapidyaml tree the same way as a scalar value.
+
+    Arguments:
+        tree: rapidyaml tree
+        node: id of the node whose key is converted
+
+    Returns:
+        the key as None, bool, int, float or str
+
+    Raises:
+
+    """
+    tag = bytes(tree.key_tag(node)).decode() if tree.has_key_tag(node) else None
+
+    return _ryml_scalar_to_python(tree.key(node), tree.is_key_plain(node), tag)
+
+
+def _ryml_scalar_to_python(scalar, plain: bool, tag: str = None):
+    """
+    Converts a rapidyaml scalar into the python object PyYAML's safe loader would create for it.
+    Scalars with a standard tag (e.g. !!str) are converted according to it.
+    Other plain (unquoted) scalars are resolved to null, bool, int, float or str, all others are strings.
+    Only plain scalars whose first character can start a null, bool, int or float are passed to the resolver.
+
+    Arguments:
+        scalar: memoryview of the scalar, or None for an empty value
+        plain: whether the scalar is plain
+        tag: the explicit tag of the scalar, if any
+
+    Returns:
+        the scalar as None, bool, int, float or str
+
+    Raises:
+
+    """
+    if scalar is None:
+        return None
+
+    value = bytes(scalar).decode()
+    if tag is not None and tag.startswith('!!'):
+        tag = 'tag:yaml.org,2002:' + tag[2:]
+    elif plain and value[:1] in _SCALAR_RESOLVER_FIRST_CHARS:
+        tag = _SCALAR_RESOLVER.resolve(yaml.ScalarNode, value, (True, False))
+    else:
+        # identifiers and formulas can only be strings and don't need to be resolved
+        return value
+
+    return _SCALAR_CONSTRUCTOR.yaml_constructors[tag](_SCALAR_CONSTRUCTOR, yaml.ScalarNode(tag, value))
+
+
 def _convert_yaml_blocks_to_sbml(model, yaml_dic: dict):
     """
     Converts each block in the yaml dictionary to SBML.
 
     Arguments:
-        model: SBML model
+        model: SBML model or SbmlStringBuilder
         yaml_dic: dictionary with yaml contents
 
     Returns:
@@ -110,18 +377,27 @@ def _convert_yaml_blocks_to_sbml(model, yaml_dic: dict):
     Raises:
 
     """
-    function_dict = {'time': read_time_block,
-                     'parameters': read_parameters_block,
-                     'states': read_states_block,
-                     'assignments': read_assignments_block,
-                     'functions': read_functions_block,
-                     'odes': read_odes_block,
-                     'observables': read_observables_block,
-                     'noise': read_noise_block,
-                     'events': read_events_block}
-
-    for block in yaml_dic:
-        function_dict[block](model, yaml_dic[block])
+    for block, payload in yaml_dic.items():
+        if block == 'odes':
+            read_odes_block(model, payload)
+        elif block == 'parameters':
+            read_parameters_block(model, payload)
+        elif block == 'states':
+            read_states_block(model, payload)
+        elif block == 'observables':
+            read_observables_block(model, payload)
+        elif block == 'assignments':
+            read_assignments_block(model, payload)
+        elif block == 'functions':
+            read_functions_block(model, payload)
+        elif block == 'time':
+            read_time_block(model, payload)
+        elif block == 'noise':
+            read_noise_block(model, payload)
+        elif block == 'events':
+            read_events_block(model, payload)
+        else:
+            raise KeyError(block)
 
     return model
 
@@ -156,6 +432,11 @@ def create_time(model, time_var: str):
     Raises:
 
     """
+    if isinstance(model, SbmlStringBuilder):
+        model.append_parameter(time_var, name=time_var, constant=False)
+        model.append_assignment_rule(time_var, 'time')
+        return
+
     time_parameter = model.createParameter()
     time_parameter.setId(time_var)
     time_parameter.setName(time_var)
@@ -163,13 +444,15 @@ def create_time(model, time_var: str):
 
     time_assignment = model.createAssignmentRule()
     time_assignment.setVariable(time_var)
-    time_assignment.setMath(sbml.parseL3Formula('time'))
+    time_assignment.setMath(_parse_formula('time'))
 
 
-def read_parameters_block(model, parameter_list: list):
+@cython.ccall
+def _process_parameters(model, parameter_list: list):
     """
     Reads and processes the parameters block in the ODE yaml file.
     In particular, it reads the parameters and adds them to the given SBML model.
+    Units are set as dimensionless by default.
     The expected format for parameter definition is
     {'id': <parameter_id>, 'value': <value>}
 
@@ -182,8 +465,24 @@ def read_parameters_block(model, parameter_list: list):
     Raises:
 
     """
-    for parameter_def in parameter_list:
-        create_parameter(model, parameter_def['id'], parameter_def['value'])
+    parameter_ids = [parameter_def['id'] for parameter_def in parameter_list]
+    values = [float(parameter_def['value']) for parameter_def in parameter_list]
+
+    if isinstance(model, SbmlStringBuilder):
+        for parameter_id, value in zip(parameter_ids, values):
+            model.append_parameter(parameter_id, name=parameter_id, value=value, units='dimensionless', constant=True)
+        return
+
+    for parameter_id, value in zip(parameter_ids, values):
+        k = model.createParameter()
+        k.setId(parameter_id)
+        k.setName(parameter_id)
+        k.setConstant(True)
+        k.setValue(value)
+        k.setUnits('dimensionless')
+
+
+read_parameters_block = _process_parameters
 
 
 def create_parameter(model, parameter_id: str, value: str):
@@ -201,21 +500,27 @@ def create_parameter(model, parameter_id: str, value: str):
     Raises:
 
     """
+    if isinstance(model, SbmlStringBuilder):
+        model.append_parameter(parameter_id, name=parameter_id, value=float(value), units='dimensionless',
+                               constant=True)
+        return
+
     k = model.createParameter()
     k.setId(parameter_id)
     k.setName(parameter_id)
     k.setConstant(True)
     k.setValue(float(value))
-
     k.setUnits('dimensionless')
 
 
-def read_states_block(model, state_list: list):
+@cython.ccall
+def _process_states(model, state_list: list):
     """
     Reads and processes the states block in the ODE yaml file.
     In particular, it reads the states and adds them to the given SBML file as species.
+    Units are set as dimensionless by default.
     The expected format of a state definition is:
-    {'id': <state_id>, 'value': <value>}
+    {'id': <state_id>, 'initial_value': <value>}
 
     Arguments:
         model: the SBML model
@@ -226,8 +531,23 @@ def read_states_block(model, state_list: list):
     Raises:
 
     """
-    for state_def in state_list:
-        create_species(model, state_def['id'], state_def['initial_value'])
+    species_ids = [state_def['id'] for state_def in state_list]
+    initial_amounts = [float(state_def['initial_value']) for state_def in state_list]
+
+    if isinstance(model, SbmlStringBuilder):
+        for species_id, initial_amount in zip(species_ids, initial_amounts):
+            model.append_species(species_id, initial_amount)
+        return
+
+    list_of_species = model.getListOfSpecies()
+    for species_id, initial_amount in zip(species_ids, initial_amounts):
+        s = _SPECIES_TEMPLATE.clone()
+        s.setId(species_id)
+        s.setInitialAmount(initial_amount)
+        list_of_species.appendAndOwn(s)
+
+
+read_states_block = _process_states
 
 
 def create_species(model, species_id: str, initial_amount: str):
@@ -241,30 +561,30 @@ def create_species(model, species_id: str, initial_amount: str):
         initial_amount: the species initial amount
 
     Returns:
-        s: the SBML species
+        s: the SBML species (None if model is a SbmlStringBuilder)
 
     Raises:
 
     """
-    s = model.createSpecies()
+    if isinstance(model, SbmlStringBuilder):
+        return model.append_species(species_id, float(initial_amount))
+
+    s = _SPECIES_TEMPLATE.clone()
     s.setId(species_id)
     s.setInitialAmount(float(initial_amount))
-    s.setConstant(False)
-    s.setBoundaryCondition(False)
-    s.setHasOnlySubstanceUnits(False)
-    s.setCompartment('Compartment')
-
-    s.setSubstanceUnits('dimensionless')
+    model.getListOfSpecies().appendAndOwn(s)
 
     return s
 
 
-def read_assignments_block(model, assignment_list: list):
+@cython.ccall
+def _process_assignments(model, assignment_list: list):
     """
     Reads and processes the assignments block in the ODE yaml file.
     In particular, it reads the assignments and adds them to the given SBML file.
-    The expected format of a state definition is:
-    {'id': <state_id>, 'formula': <formula>}
+    Each assignment creates a parameter and an assignment rule, that assigns the parameter to the formula.
+    The expected format of an assignment definition is:
+    {'id': <assignment_id>, 'formula': <formula>}
     This is used to assign a formula (probably time-dependent) to a variable.
 
     Arguments:
@@ -276,9 +596,34 @@ def read_assignments_block(model, assignment_list: list):
     Raises:
 
     """
+    if isinstance(model, SbmlStringBuilder):
+        for assignment_def in assignment_list:
+            assignment_id = assignment_def['id']
+            model.append_parameter(assignment_id, name=assignment_id, units='dimensionless', constant=False)
+            model.append_assignment_rule(assignment_id, assignment_def['formula'])
+        return
+
+    # each distinct formula of the block is parsed once, also when there are more than the lru_cache holds
+    formula_asts = {}
 
     for assignment_def in assignment_list:
-        create_assignment(model, assignment_def['id'], assignment_def['formula'])
+        assignment_id = assignment_def['id']
+        formula = assignment_def['formula']
+        if formula not in formula_asts:
+            formula_asts[formula] = _parse_formula(formula)
+
+        assignment_parameter = model.createParameter()
+        assignment_parameter.setId(assignment_id)
+        assignment_parameter.setName(assignment_id)
+        assignment_parameter.setConstant(False)
+        assignment_parameter.setUnits('dimensionless')
+
+        assignment_rule = model.createAssignmentRule()
+        assignment_rule.setVariable(assignment_id)
+        assignment_rule.setMath(formula_asts[formula])
+
+
+read_assignments_block = _process_assignments
 
 
 def create_assignment(model, assignment_id: str, formula: str):
@@ -294,6 +639,11 @@ def create_assignment(model, assignment_id: str, formula: str):
     Raises:
 
     """
+    if isinstance(model, SbmlStringBuilder):
+        model.append_parameter(assignment_id, name=assignment_id, units='dimensionless', constant=False)
+        model.append_assignment_rule(assignment_id, formula)
+        return
+
     assignment_parameter = model.createParameter()
     assignment_parameter.setId(assignment_id)
     assignment_parameter.setName(assignment_id)
@@ -302,15 +652,15 @@ def create_assignment(model, assignment_id: str, formula: str):
 
     assignment_rule = model.createAssignmentRule()
     assignment_rule.setVariable(assignment_id)
-    assignment_rule.setMath(sbml.parseL3Formula(formula))
+    assignment_rule.setMath(_parse_formula(formula))
 
 
-def read_functions_block(model, functions_list: list):
+def _process_functions(model, functions_list: list):
     """
     Reads and processes the functions block in the ODE yaml file.
     In particular, it reads the functions and adds them to the given SBML file as functionDefinitions.
     The expected format of a function definition is:
-    {'id': <state_id>, 'arguments': <arguments>,  'formula' : <formula>}
+    {'id': <function_id>, 'arguments': <arguments>,  'formula' : <formula>}
 
     Arguments:
         model: a SBML model
@@ -321,8 +671,36 @@ def read_functions_block(model, functions_list: list):
     Raises:
 
     """
+    if isinstance(model, SbmlStringBuilder):
+        for function_def in functions_list:
+            model.append_function_definition(function_def['id'],
+                                             _lambda_formula(function_def['arguments'], function_def['formula']))
+        return
+
     for function_def in functions_list:
-        create_function(model, function_def['id'], function_def['arguments'], function_def['formula'])
+        f = model.createFunctionDefinition()
+        f.setId(function_def['id'])
+        f.setMath(_parse_formula(_lambda_formula(function_def['arguments'], function_def['formula'])))
+
+
+read_functions_block = _process_functions
+
+
+def _lambda_formula(arguments: str, formula: str) -> str:
+    """
+    Builds the lambda expression of a function definition, e.g. 'lambda(x, y, x * y)'.
+
+    Arguments:
+        arguments: the arguments of the function
+        formula: the formula of the function
+
+    Returns:
+        the lambda expression
+
+    Raises:
+
+    """
+    return f'lambda({arguments}, {formula})'
 
 
 def create_function(model, function_id: str, arguments: str, formula: str):
@@ -340,17 +718,21 @@ def create_function(model, function_id: str, arguments: str, formula: str):
     Raises:
 
     """
+    if isinstance(model, SbmlStringBuilder):
+        model.append_function_definition(function_id, _lambda_formula(arguments, formula))
+        return
+
     f = model.createFunctionDefinition()
     f.setId(function_id)
-    math = sbml.parseL3Formula('lambda(' + arguments + ', ' + formula + ')')
-    f.setMath(math)
+    f.setMath(_parse_formula(_lambda_formula(arguments, formula)))
 
 
-def read_odes_block(model, odes_list: list):
+@cython.ccall
+def _process_odes(model, odes_list: list):
     """
     Reads and processes lines in the odes block in the ODE yaml file.
     In particular, it reads the odes and adds them to the given SBML file as rateRules.
-    The expected format of an ode definition is: {'id': <state_variable>, 'right_hand_side' : <right_hand_side>}
+    The expected format of an ode definition is: {'state': <state_variable>, 'right_hand_side' : <right_hand_side>}
 
     Arguments:
         model: a SBML model
@@ -361,8 +743,25 @@ def read_odes_block(model, odes_list: list):
     Raises:
 
     """
+    if isinstance(model, SbmlStringBuilder):
+        for ode_def in odes_list:
+            model.append_rate_rule(ode_def['state'], ode_def['right_hand_side'])
+        return
+
+    # each distinct formula of the block is parsed once, also when there are more than the lru_cache holds
+    formula_asts = {}
+
     for ode_def in odes_list:
-        create_rate_rule(model, ode_def['state'], ode_def['right_hand_side'])
+        formula = ode_def['right_hand_side']
+        if formula not in formula_asts:
+            formula_asts[formula] = _parse_formula(formula)
+
+        r = model.createRateRule()
+        r.setVariable(ode_def['state'])
+        r.setMath(formula_asts[formula])
+
+
+read_odes_block = _process_odes
 
 
 def create_rate_rule(model, species: str, formula: str):
@@ -380,17 +779,23 @@ def create_rate_rule(model, species: str, formula: str):
     Raises:
 
     """
+    if isinstance(model, SbmlStringBuilder):
+        model.append_rate_rule(species, formula)
+        return
+
     r = model.createRateRule()
-    r.setId('d/dt_' + species)
     r.setVariable(species)
-    math_ast = sbml.parseL3Formula(formula)
-    r.setMath(math_ast)
+    r.setMath(_parse_formula(formula))
 
 
-def read_observables_block(model, observable_list: list):
+@cython.ccall
+def _process_observables(model, observable_list: list):
     """
     Reads an processes the observables block in the ODE yaml file.
     In particular it generates the Observables in the SBML file.
+    Each observable creates a parameter with the id observable_<observable_id> and an assignment rule,
+    that assigns the parameter to the observable formula.
+    Units are set as dimensionless by default.
     The expected format is: {'id': <observable_id>, 'formula': <observable_formula>}
 
     Arguments:
@@ -403,12 +808,39 @@ def read_observables_block(model, observable_list: list):
 
     """
     try:
+        if isinstance(model, SbmlStringBuilder):
+            for observable_def in observable_list:
+                observable_id = observable_def['id']
+                model.append_parameter('observable_' + observable_id, name=observable_id, units='dimensionless',
+                                       constant=False)
+                model.append_assignment_rule('observable_' + observable_id, observable_def['formula'])
+            return
+
+        # each distinct formula of the block is parsed once, also when there are more than the lru_cache holds
+        formula_asts = {}
+
         for observable_def in observable_list:
-            create_observable(model, observable_def['id'], observable_def['formula'])
+            observable_id = observable_def['id']
+            formula = observable_def['formula']
+            if formula not in formula_asts:
+                formula_asts[formula] = _parse_formula(formula)
+
+            obs_param = model.createParameter()
+            obs_param.setId('observable_' + observable_id)
+            obs_param.setName(observable_id)
+            obs_param.setConstant(False)
+            obs_param.setUnits('dimensionless')
+
+            obs_assignment_rule = model.createAssignmentRule()
+            obs_assignment_rule.setVariable('observable_' + observable_id)
+            obs_assignment_rule.setMath(formula_asts[formula])
     except TypeError:
         pass
 
 
+read_observables_block = _process_observables
+
+
 def create_observable(model, observable_id: str, formula: str):
     """
     Creates a parameter with the name observable_id and an assignment rule, that assigns the parameter to
@@ -425,6 +857,12 @@ def create_observable(model, observable_id: str, formula: str):
     Raises:
 
     """
+    if isinstance(model, SbmlStringBuilder):
+        model.append_parameter('observable_' + observable_id, name=observable_id, units='dimensionless',
+                               constant=False)
+        model.append_assignment_rule('observable_' + observable_id, formula)
+        return
+
     obs_param = model.createParameter()
     obs_param.setId('observable_' + observable_id)
     obs_param.setName(observable_id)
@@ -433,7 +871,286 @@ def create_observable(model, observable_id: str, formula: str):
 
     obs_assignment_rule = model.createAssignmentRule()
     obs_assignment_rule.setVariable('observable_' + observable_id)
-    obs_assignment_rule.setMath(sbml.parseL3Formula(formula))
+    obs_assignment_rule.setMath(_parse_formula(formula))
+
+
+@functools.lru_cache(maxsize=4096)
+def _parse_formula(formula: str):
+    """
+    Parses a formula with libsbml and caches the resulting AST.
+    The AST is shared between all callers, so it may only be passed to setMath, which stores a copy of it.
+
+    Arguments:
+        formula: the formula to parse
+
+    Returns:
+        the (shared) ASTNode of the formula, or None if it could not be parsed
+
+    Raises:
+
+    """
+    return sbml.parseL3FormulaWithSettings(formula, _L3_SETTINGS)
+
+
+@functools.lru_cache(maxsize=4096)
+def _formula_to_mathml(formula: str) -> str:
+    """
+    Converts a formula into a MathML <math> element, indented for use inside an SBML rule or function definition.
+
+    Arguments:
+        formula: the formula to convert
+
+    Returns:
+        the MathML fragment, or an empty string if the formula could not be parsed
+
+    Raises:
+
+    """
+    math_ast = _parse_formula(formula)
+    if math_ast is None:
+        return ''
+
+    # drop the xml declaration written by libsbml
+    mathml_lines = sbml.writeMathMLToString(math_ast).split('\n')[1:]
+
+    return ''.join(' ' * 8 + line + '\n' for line in mathml_lines)
+
+
+def _format_xml_attribute(value) -> str:
+    """
+    Formats an attribute value the same way libsbml does.
+
+    Arguments:
+        value: bool, float, int or str
+
+    Returns:
+        the escaped attribute value
+
+    Raises:
+
+    """
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, (float, int)):
+        if math.isnan(value):
+            return 'NaN'
+        if math.isinf(value):
+            return 'INF' if value > 0 else '-INF'
+        return '%.15g' % value
+
+    return xml.sax.saxutils.escape(value, {'"': '&quot;', "'": '&apos;'})
+
+
+class SbmlStringBuilder:
+    """
+    Assembles the SBML string of a model directly, without creating libsbml objects for its entities.
+    Only formulas are parsed by libsbml to convert them to MathML.
+    The output is identical to the one libsbml writes for the same model, as long as all ids and values are valid.
+    The block readers and create_* functions accept it in place of a libsbml model.
+    """
+
+    def __init__(self):
+        self._function_definitions = []
+        self._compartments = []
+        self._species = []
+        self._parameters = []
+        self._rules = []
+
+        # MathML of each distinct formula of the model, also when there are more than the lru_cache holds
+        self._formula_mathml = {}
+
+        # attributes shared by all species, in the order libsbml writes them
+        self._species_compartment = [('compartment', _SPECIES_TEMPLATE.getCompartment())]
+        self._species_attributes = [
+            ('substanceUnits', _SPECIES_TEMPLATE.getSubstanceUnits()),
+            ('hasOnlySubstanceUnits', _SPECIES_TEMPLATE.getHasOnlySubstanceUnits()),
+            ('boundaryCondition', _SPECIES_TEMPLATE.getBoundaryCondition()),
+            ('constant', _SPECIES_TEMPLATE.getConstant())]
+
+    @staticmethod
+    def _element(tag: str, attributes: list) -> str:
+        """
+        Formats an empty element.
+
+        Arguments:
+            tag: the element name
+            attributes: list of (name, value) tuples, attributes with value None are skipped
+
+        Returns:
+            the formatted element
+
+        Raises:
+
+        """
+        attribute_string = ''.join(f' {name}="{_format_xml_attribute(value)}"'
+                                   for name, value in attributes if value is not None)
+        return f'      <{tag}{attribute_string}/>\n'
+
+    def _element_with_math(self, tag: str, attribute: str, value: str, formula: str) -> str:
+        """
+        Formats an element with a single attribute and the MathML of the given formula as content.
+
+        Arguments:
+            tag: the element name
+            attribute: the attribute name
+            value: the attribute value
+            formula: the formula to convert to MathML
+
+        Returns:
+            the formatted element
+
+        Raises:
+
+        """
+        if formula not in self._formula_mathml:
+            self._formula_mathml[formula] = _formula_to_mathml(formula)
+        mathml = self._formula_mathml[formula]
+        if not mathml:
+            return f'      <{tag} {attribute}="{_format_xml_attribute(value)}"/>\n'
+
+        return f'      <{tag} {attribute}="{_format_xml_attribute(value)}">\n{mathml}      </{tag}>\n'
+
+    def append_default_compartment(self):
+        """
+        Adds the default compartment with the attributes of the template compartment.
+
+        Arguments:
+
+        Returns:
+
+        Raises:
+
+        """
+        self._compartments.append(
+            self._element('compartment', [('id', _TEMPLATE_COMPARTMENT.getId()),
+                                          ('size', _TEMPLATE_COMPARTMENT.getSize()),
+                                          ('constant', _TEMPLATE_COMPARTMENT.getConstant())]))
+
+    def append_function_definition(self, function_id: str, formula: str):
+        """
+        Adds a functionDefinition.
+
+        Arguments:
+            function_id: the function id
+            formula: the lambda expression of the function
+
+        Returns:
+
+        Raises:
+
+        """
+        self._function_definitions.append(
+            self._element_with_math('functionDefinition', 'id', function_id, formula))
+
+    def append_species(self, species_id: str, initial_amount: float):
+        """
+        Adds a species, all other attributes are taken from the species template.
+
+        Arguments:
+            species_id: the species ID
+            initial_amount: the species initial amount
+
+        Returns:
+            None, there is no SBML species object
+
+        Raises:
+
+        """
+        self._species.append(
+            self._element('species', [('id', species_id)]
+                          + self._species_compartment
+                          + [('initialAmount', initial_amount)]
+                          + self._species_attributes))
+
+    def append_parameter(self, parameter_id: str, name: str = None, value: float = None, units: str = None,
+                         constant: bool = None):
+        """
+        Adds a parameter. Attributes that are None are not written.
+
+        Arguments:
+            parameter_id: the parameter ID
+            name: the parameter name
+            value: the parameter value
+            units: the parameter units
+            constant: whether the parameter is constant
+
+        Returns:
+
+        Raises:
+
+        """
+        self._parameters.append(
+            self._element('parameter', [('id', parameter_id),
+                                        ('name', name),
+                                        ('value', value),
+                                        ('units', units),
+                                        ('constant', constant)]))
+
+    def append_assignment_rule(self, variable: str, formula: str):
+        """
+        Adds an assignmentRule, that assigns the variable to the formula.
+
+        Arguments:
+            variable: the id of the assigned variable
+            formula: the formula of the rule
+
+        Returns:
+
+        Raises:
+
+        """
+        self._rules.append(self._element_with_math('assignmentRule', 'variable', variable, formula))
+
+    def append_rate_rule(self, variable: str, formula: str):
+        """
+        Adds a rateRule, that sets the derivative of the variable to the formula.
+
+        Arguments:
+            variable: the id of the variable, e.g. a species
+            formula: the right-hand-side of the ODE
+
+        Returns:
+
+        Raises:
+
+        """
+        self._rules.append(self._element_with_math('rateRule', 'variable', variable, formula))
+
+    def to_string(self) -> str:
+        """
+        Assembles the SBML string from all entities added so far.
+
+        Arguments:
+
+        Returns:
+            sbml_string: the model in SBML format
+
+        Raises:
+
+        """
+        parts = ['<?xml version="1.0" encoding="UTF-8"?>\n',
+                 '<sbml xmlns="http://www.sbml.org/sbml/level3/version1/core" level="3" version="1">\n']
+
+        list_of = [('listOfFunctionDefinitions', self._function_definitions),
+                   ('listOfCompartments', self._compartments),
+                   ('listOfSpecies', self._species),
+                   ('listOfParameters', self._parameters),
+                   ('listOfRules', self._rules)]
+
+        if any(elements for _, elements in list_of):
+            parts.append('  <model>\n')
+            for tag, elements in list_of:
+                if elements:
+                    parts.append(f'    <{tag}>\n')
+                    parts.extend(elements)
+                    parts.append(f'    </{tag}>\n')
+            parts.append('  </model>\n')
+        else:
+            parts.append('  <model/>\n')
+
+        parts.append('</sbml>\n')
+
+        return ''.join(parts)
 
 
 def read_noise_block(model, line):